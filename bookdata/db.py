@@ -1,6 +1,7 @@
 import os
 import sys
 import re
+import atexit
 import time
 import logging
 import hashlib
@@ -8,14 +9,15 @@ import threading
 from configparser import ConfigParser
 from pathlib import Path
 from contextlib import contextmanager
+from functools import lru_cache
 from datetime import timedelta
-from typing import NamedTuple, List
+from io import StringIO
+from typing import NamedTuple, List, Optional
 from docopt import docopt
 from natural.date import compress as compress_date
 
 import pandas as pd
 
-from more_itertools import peekable
 import psycopg2, psycopg2.errorcodes
 from psycopg2 import sql
 from psycopg2.pool import ThreadedConnectionPool
@@ -23,6 +25,15 @@ from sqlalchemy import create_engine
 import sqlparse
 import git
 
+try:
+    # pglast.ast only exists in pglast 3 and later; older versions parse to dicts,
+    # which _pg_describe cannot read, so they fall back to sqlparse too
+    import pglast.ast
+    from pglast import parse_sql
+    from pglast.parser import ParseError
+except ImportError:
+    parse_sql = None
+
 _log = logging.getLogger(__name__)
 
 # Meta-schema for storing stage and file status in the database
@@ -96,11 +107,15 @@ def db_url():
 
 @contextmanager
 def connect():
-    "Connect to a database. This context manager yields the connection, and closes it when exited."
+    """
+    Connect to a database. This context manager yields a connection from the
+    process-wide pool, and returns it to the pool when exited.
+    """
     global _pool
     if _pool is None:
         _log.info('connecting to %s', db_url())
         _pool = ThreadedConnectionPool(1, 5, db_url())
+        atexit.register(_pool.closeall)
 
     conn = _pool.getconn()
     try:
@@ -126,8 +141,92 @@ def _tokens(s, start=-1, skip_ws=True, skip_cm=True):
         i, t = s.token_next(i, skip_ws=skip_ws, skip_cm=skip_cm)
 
 
+_pg_dml = {
+    'SelectStmt': 'SELECT',
+    'InsertStmt': 'INSERT',
+    'UpdateStmt': 'UPDATE',
+    'DeleteStmt': 'DELETE',
+}
+
+_pg_persistence = {
+    't': 'TEMPORARY ',
+    'u': 'UNLOGGED ',
+}
+
+
+def _pg_ine(node):
+    "Get the ``IF NOT EXISTS`` clause of a statement, to keep it in the description."
+    return ' IF NOT EXISTS' if node.if_not_exists else ''
+
+
+def _pg_relname(rv):
+    if rv.schemaname:
+        return f'{rv.schemaname}.{rv.relname}'
+    else:
+        return rv.relname
+
+
+def _pg_describe(src):
+    """
+    Describe a statement with PostgreSQL's own parser (through pglast).  Returns
+    ``None`` for statements it does not know how to describe.
+    """
+    try:
+        stmts = parse_sql(src)
+    except ParseError:
+        return None
+    if not stmts:
+        return None
+
+    node = stmts[0].stmt
+    kind = type(node).__name__
+    if kind in _pg_dml:
+        return _pg_dml[kind]
+    elif kind == 'CreateStmt':
+        what = _pg_persistence.get(node.relation.relpersistence, '') + 'TABLE'
+        return f'CREATE {what}{_pg_ine(node)} {_pg_relname(node.relation)}'
+    elif kind == 'CreateTableAsStmt':
+        # PostgreSQL 13 renamed relkind to objtype
+        ot = getattr(node, 'objtype', None) or getattr(node, 'relkind', None)
+        if getattr(ot, 'name', None) == 'OBJECT_MATVIEW':
+            what = 'MATERIALIZED VIEW'
+        else:
+            what = _pg_persistence.get(node.into.rel.relpersistence, '') + 'TABLE'
+        return f'CREATE {what}{_pg_ine(node)} {_pg_relname(node.into.rel)}'
+    elif kind == 'ViewStmt':
+        what = 'OR REPLACE VIEW' if node.replace else 'VIEW'
+        return f'CREATE {what} {_pg_relname(node.view)}'
+    elif kind == 'IndexStmt':
+        what = 'UNIQUE INDEX' if node.unique else 'INDEX'
+        if node.idxname:
+            return f'CREATE {what}{_pg_ine(node)} {node.idxname}'
+        else:
+            return f'CREATE {what} ON {_pg_relname(node.relation)}'
+    elif kind == 'AlterTableStmt':
+        what = 'TABLE IF EXISTS' if node.missing_ok else 'TABLE'
+        only = '' if node.relation.inh else 'ONLY '
+        return f'ALTER {what} {only}{_pg_relname(node.relation)}'
+    else:
+        return None
+
+
 def describe_statement(s):
-    "Describe an SQL statement.  This utility function is used to summarize statements."
+    """
+    Describe an SQL statement.  This utility function is used to summarize statements.
+    If pglast is installed, it is used for the statements it can describe; otherwise,
+    the statement is described with sqlparse.  Descriptions are cached by statement text.
+    """
+    return _describe(str(s))
+
+
+@lru_cache(maxsize=1024)
+def _describe(src):
+    if parse_sql is not None:
+        label = _pg_describe(src)
+        if label is not None:
+            return label
+
+    s = sqlparse.parse(src)[0]
     label = s.get_type()
     li, lt = s.token_next(-1, skip_cm=True)
     if lt is None:
@@ -177,12 +276,55 @@ def is_empty(s):
     return lt is None
 
 
+_stmt_token_re = re.compile(r'''
+      (?P<str>
+          (?<!\w)[eE]'[^'\\]*(?:(?:\\.|'')[^'\\]*)*'        # escape string
+        | '[^']*(?:''[^']*)*'                               # string literal
+        | "[^"]*(?:""[^"]*)*"                               # quoted identifier
+        | (?<![\w$])\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?\$(?P=tag)\$  # dollar quoting
+      )
+    | (?P<cmt>--[^\n]*|/\*.*?\*/)
+    | (?P<semi>;)
+    | (?P<other>[^'"$;/\-eE]+|.)
+''', re.VERBOSE | re.DOTALL)
+
+
+def _split_statements(src):
+    """
+    Split a chunk of SQL into statements on unquoted semicolons.  This only tokenizes
+    enough to skip string literals, quoted identifiers, and comments, so it is much
+    cheaper than parsing with sqlparse.  Empty statements are skipped.
+    """
+    start = 0
+    content = False
+    for m in _stmt_token_re.finditer(src):
+        if m.group('semi'):
+            if content:
+                yield src[start:m.start()].strip()
+            start = m.end()
+            content = False
+        elif not content and m.group('cmt') is None:
+            content = not m.group().isspace()
+
+    if content:
+        yield src[start:].strip()
+
+
+# session settings for bulk-load chunks, trading crash safety of the last commit for speed
+_bulk_settings = """
+SET LOCAL synchronous_commit = off;
+SET LOCAL maintenance_work_mem = '1GB';
+"""
+
+
 class ScriptChunk(NamedTuple):
     "A single chunk of an SQL script."
     label: str
     allowed_errors: List[str]
     src: str
     use_transaction: bool = True
+    copy: Optional[str] = None
+    bulk: bool = False
 
     @property
     def statements(self):
@@ -197,58 +339,65 @@ class SqlScript:
     * Splitting the script into (named) steps, to commit chunks in transactions
     * Recording metadata (currently just dependencies) for the script
     * Allowing chunks to fail with specific errors
+    * Loading literal data with ``COPY`` (``--- #copy table(col, ...)``)
+    * Relaxing durability settings for bulk-load chunks (``--- #bulk``)
 
     The last feature is to help with writing _idempotent_ scripts: by allowing a chunk
     to fail with a known error (e.g. creating a constraint that already exists), you
     can write a script that can run cleanly even if it has already been run.
 
+    The body of a ``#copy`` chunk is tab-separated data in PostgreSQL's ``COPY`` text
+    format, not SQL; it is streamed to the server as-is and never parsed.
+
     Args:
-        file: the path to the SQL script to read.
+        file: the path to the SQL script to read, or an open (text or binary) file.
     """
 
-    _sep_re = re.compile(r'^---\s*(?P<inst>.*)')
-    _icode_re = re.compile(r'#(?P<code>\w+)\s*(?P<args>.*\S)?\s*$')
+    # separator lines, with an optional instruction code
+    _hdr_re = re.compile(r'^---\s*(?:#(?P<code>\w+)\s*(?P<args>.*\S)?\s*$)?')
 
     chunks: List[ScriptChunk]
 
     def __init__(self, file):
         if hasattr(file, 'read'):
-            self._parse(peekable(file))
+            data = file.read()
         else:
-            with open(file, 'r', encoding='utf8') as f:
-                self._parse(peekable(f))
-
-    def _parse(self, lines):
+            # read the raw bytes in one call, skipping the text layer's newline handling
+            with open(file, 'rb') as f:
+                data = f.read()
+        if isinstance(data, bytes):
+            data = data.decode('utf8')
+        # only split on line breaks; str.splitlines also breaks on other control characters
+        self._parse(data.replace('\r\n', '\n').replace('\r', '\n').split('\n'))
+
+    def _parse(self, lines: List[str]):
         self.chunks = []
-        self.deps, self.tables = self._parse_script_header(lines)
-        next_chunk = self._parse_chunk(lines, len(self.chunks) + 1)
+        self.deps, self.tables, i = self._parse_script_header(lines, 0)
+        next_chunk, i = self._parse_chunk(lines, i, len(self.chunks) + 1)
         while next_chunk is not None:
             if next_chunk:
                 self.chunks.append(next_chunk)
-            next_chunk = self._parse_chunk(lines, len(self.chunks) + 1)
+            next_chunk, i = self._parse_chunk(lines, i, len(self.chunks) + 1)
 
     @classmethod
-    def _parse_script_header(cls, lines):
+    def _parse_script_header(cls, lines: List[str], i: int):
         deps = []
         tables = []
 
-        line = lines.peek(None)
-        while line is not None:
-            hm = cls._sep_re.match(line)
+        while i < len(lines):
+            hm = cls._hdr_re.match(lines[i])
             if hm is None:
                 break
 
-            inst = hm.group('inst')
-            cm = cls._icode_re.match(inst)
-            if cm is None:
-                next(lines)  # eat line
+            code = hm.group('code')
+            if code is None:
+                i += 1  # eat line
                 continue
 
-            code = cm.group('code')
-            args = cm.group('args')
+            args = hm.group('args')
             if code == 'dep':
                 deps.append(args)
-                next(lines)  # eat line
+                i += 1  # eat line
             elif code == 'table':
                 parts = args.split('.', 2)
                 if len(parts) > 1:
@@ -256,50 +405,46 @@ class SqlScript:
                     tables.append((ns, tbl))
                 else:
                     tables.append(('public', args))
-                next(lines)  # eat line
+                i += 1  # eat line
             else:  # any other code, we're out of header
                 break
 
-            line = lines.peek(None)
-
-        return deps, tables
+        return deps, tables, i
 
     @classmethod
-    def _parse_chunk(cls, lines: peekable, n: int):
-        qlines = []
-
-        chunk = cls._read_header(lines)
-        qlines = cls._read_query(lines)
+    def _parse_chunk(cls, lines: List[str], i: int, n: int):
+        chunk, i = cls._read_header(lines, i)
+        qlines, i = cls._read_query(lines, i)
 
         # end of file, do we have a chunk?
         if qlines:
             if chunk.label is None:
                 chunk = chunk._replace(label=f'Step {n}')
-            return chunk._replace(src='\n'.join(qlines))
+            return chunk._replace(src='\n'.join(qlines)), i
         elif qlines is not None:
-            return False  # empty chunk
+            return False, i  # empty chunk
+        else:
+            return None, i
 
     @classmethod
-    def _read_header(cls, lines: peekable):
+    def _read_header(cls, lines: List[str], i: int):
         label = None
         errs = []
         tx = True
+        copy = None
+        bulk = False
 
-        line = lines.peek(None)
-        while line is not None:
-            hm = cls._sep_re.match(line)
+        while i < len(lines):
+            hm = cls._hdr_re.match(lines[i])
             if hm is None:
                 break
 
-            next(lines)  # eat line
-            line = lines.peek(None)
+            i += 1  # eat line
 
-            inst = hm.group('inst')
-            cm = cls._icode_re.match(inst)
-            if cm is None:
+            code = hm.group('code')
+            if code is None:
                 continue
-            code = cm.group('code')
-            args = cm.group('args')
+            args = hm.group('args')
             if code == 'step':
                 label = args
             elif code == 'allow':
@@ -309,32 +454,44 @@ class SqlScript:
             elif code == 'notx':
                 _log.debug('chunk will run outside a transaction')
                 tx = False
+            elif code == 'copy':
+                if not args:
+                    _log.error('copy instruction has no target table')
+                    raise ValueError('copy instruction requires a table')
+                _log.debug('chunk will be copied into %s', args)
+                copy = args
+            elif code == 'bulk':
+                _log.debug('chunk is a bulk load')
+                bulk = True
             else:
                 _log.error('unrecognized query instruction %s', code)
                 raise ValueError(f'invalid query instruction {code}')
 
+        if bulk and not tx:
+            # the bulk settings are transaction-local, so they would do nothing
+            _log.warning('ignoring bulk instruction for %s, which is outside a transaction', label)
+            bulk = False
+
         return ScriptChunk(label=label, allowed_errors=errs, src=None,
-                           use_transaction=tx)
+                           use_transaction=tx, copy=copy, bulk=bulk), i
 
     @classmethod
-    def _read_query(cls, lines: peekable):
-        qls = []
-
-        line = lines.peek(None)
-        while line is not None and not cls._sep_re.match(line):
-            qls.append(next(lines))
-            line = lines.peek(None)
+    def _read_query(cls, lines: List[str], i: int):
+        start = i
+        while i < len(lines) and not cls._hdr_re.match(lines[i]):
+            i += 1
 
         # trim lines
-        while qls and not qls[0].strip():
-            qls.pop(0)
-        while qls and not qls[-1].strip():
-            qls.pop(-1)
-
-        if qls or line is not None:
-            return qls
+        lo, hi = start, i
+        while lo < hi and not lines[lo].strip():
+            lo += 1
+        while hi > lo and not lines[hi - 1].strip():
+            hi -= 1
+
+        if lo < hi or i < len(lines):
+            return lines[lo:hi], i
         else:
-            return None  # end of file
+            return None, i  # end of file
 
     def execute(self, dbc, transcript=None):
         """
@@ -375,31 +532,52 @@ class SqlScript:
             _log.info('Dependency ‘%s’', dep)
         for step in self.chunks:
             _log.info('Chunk ‘%s’', step.label)
+            if step.copy:
+                _log.info('Copy into %s', step.copy)
+                continue
             for s in step.statements:
                 _log.info('Statement %s', describe_statement(s))
 
     def _run_step(self, step, dbc, cur, commit, transcript):
+        # chunks that don't need per-statement handling can go to the server at once
+        batch = (not step.copy and step.use_transaction and not step.allowed_errors
+                 and transcript is None and not _log.isEnabledFor(logging.DEBUG))
+        what = None
         try:
-            for sql in step.statements:
-                start = time.perf_counter()
-                _log.debug('Executing %s', describe_statement(sql))
-                _log.debug('Query: %s', sql)
-                if transcript is not None:
-                    print('STMT', describe_statement(sql), file=transcript)
-                cur.execute(str(sql))
-                elapsed = time.perf_counter() - start
-                elapsed = timedelta(seconds=elapsed)
-                rows = cur.rowcount
-                if transcript is not None:
-                    print('ELAPSED', elapsed, file=transcript)
-                if rows is not None and rows >= 0:
+            if step.bulk and not batch:
+                # these only last until the chunk's transaction ends; batches send them
+                # along with the chunk itself
+                what = 'bulk settings'
+                cur.execute(_bulk_settings)
+            if step.copy:
+                what = f'COPY {step.copy}'
+                self._run_copy(step, cur, transcript)
+            elif batch:
+                what = 'batch'
+                self._run_batch(step, cur)
+            else:
+                for sql in _split_statements(step.src):
+                    start = time.perf_counter()
+                    desc = what = describe_statement(sql)
+                    _log.debug('Executing %s', desc)
+                    if _log.isEnabledFor(logging.DEBUG):
+                        _log.debug('Query: %s', sql)
                     if transcript is not None:
-                        print('ROWS', rows, file=transcript)
-                    _log.info('finished %s in %s (%d rows)', describe_statement(sql),
-                              compress_date(elapsed), rows)
-                else:
-                    _log.info('finished %s in %s (%d rows)', describe_statement(sql),
-                              compress_date(elapsed), rows)
+                        print('STMT', desc, file=transcript)
+                    cur.execute(sql)
+                    elapsed = time.perf_counter() - start
+                    elapsed = timedelta(seconds=elapsed)
+                    rows = cur.rowcount
+                    if transcript is not None:
+                        print('ELAPSED', elapsed, file=transcript)
+                    if rows is not None and rows >= 0:
+                        if transcript is not None:
+                            print('ROWS', rows, file=transcript)
+                        _log.info('finished %s in %s (%d rows)', desc,
+                                  compress_date(elapsed), rows)
+                    else:
+                        _log.info('finished %s in %s (%d rows)', desc,
+                                  compress_date(elapsed), rows)
             if commit:
                 dbc.commit()
         except psycopg2.Error as e:
@@ -409,13 +587,41 @@ class SqlScript:
                 if transcript is not None:
                     print('ERROR', e.pgcode, psycopg2.errorcodes.lookup(e.pgcode), file=transcript)
             else:
-                _log.error('Error in "%s" %s: %s: %s',
-                           step.label, describe_statement(sql),
+                _log.error('Error in "%s" %s: %s: %s', step.label, what,
                            psycopg2.errorcodes.lookup(e.pgcode), e)
                 if e.pgerror:
                     _log.info('Query diagnostics:\n%s', e.pgerror)
                 raise e
 
+    def _run_batch(self, step, cur):
+        """
+        Run a whole chunk as a single multi-statement query, saving a round trip per
+        statement.  PostgreSQL's gains from batching inserts level off around 10K rows,
+        so data-loading chunks don't need to be bigger than that.
+        """
+        start = time.perf_counter()
+        if step.bulk:
+            cur.execute(_bulk_settings + step.src)
+        else:
+            cur.execute(step.src)
+        elapsed = time.perf_counter() - start
+        elapsed = timedelta(seconds=elapsed)
+        _log.info('finished batch in %s', compress_date(elapsed))
+
+    def _run_copy(self, step, cur, transcript):
+        "Load a ``#copy`` chunk's data into its table with ``COPY FROM STDIN``."
+        start = time.perf_counter()
+        if transcript is not None:
+            print('COPY', step.copy, file=transcript)
+        cur.copy_expert(f'COPY {step.copy} FROM STDIN', StringIO(step.src))
+        elapsed = time.perf_counter() - start
+        elapsed = timedelta(seconds=elapsed)
+        rows = cur.rowcount
+        if transcript is not None:
+            print('ELAPSED', elapsed, file=transcript)
+            print('ROWS', rows, file=transcript)
+        _log.info('copied %d rows into %s in %s', rows, step.copy, compress_date(elapsed))
+
 
 class _LoadThread(threading.Thread):
     """
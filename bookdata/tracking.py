@@ -2,15 +2,28 @@
 Code for supporting import data tracking and relationships.
 """
 
+import os
 import hashlib
 import logging
 from io import StringIO
 from pathlib import Path
 
+from psycopg2.extras import execute_values
+
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
+
 from . import db
 
 _log = logging.getLogger(__name__)
 
+# Source file checksums use MD5; set BOOKDATA_FILE_HASH=blake3 to use BLAKE3 instead
+_hash_name = os.environ.get('BOOKDATA_FILE_HASH', 'md5')
+if _hash_name not in ('blake3', 'md5'):
+    raise ValueError(f'invalid BOOKDATA_FILE_HASH {_hash_name!r}, expected blake3 or md5')
+
 
 def _init_db(dbc):
     # initialize database, in case nothing has been run
@@ -18,19 +31,43 @@ def _init_db(dbc):
         cur.execute(db.meta_schema)
 
 
-def hash_and_record_file(cur, path, stage=None):
-    """
-    Compute the checksum of a file and record it in the database.
-    """
-    h = hashlib.md5()
+def _new_hash():
+    "Create a hasher for source file checksums."
+    if _hash_name == 'md5':
+        return hashlib.md5()
+    elif blake3 is None:
+        raise RuntimeError('BOOKDATA_FILE_HASH is blake3, but blake3 is not installed')
+    else:
+        return blake3()
+
+
+def _hash_file(path):
+    "Compute the checksum of a file."
+    h = _new_hash()
     with open(path, 'rb') as f:
         data = f.read(8192 * 4)
         while data:
             h.update(data)
             data = f.read(8192 * 4)
-    hash = h.hexdigest()
+    return h.hexdigest()
+
+
+def hash_data(data):
+    """
+    Compute the checksum of file contents that have already been read, so a file that
+    is read anyway does not need to be read again to record it.
+    """
+    h = _new_hash()
+    h.update(data)
+    return h.hexdigest()
+
+
+def hash_and_record_file(cur, path, stage=None):
+    """
+    Compute the checksum of a file and record it in the database.
+    """
+    hash = _hash_file(path)
     path = Path(path).as_posix()
-    _log.info('recording file %s with hash %s', path, hash)
     record_file(cur, path, hash, stage)
     return hash
 
@@ -96,21 +133,52 @@ def record_tbl(cur, stage, ns, tbl):
 
 def record_file(cur, file, hash, stage=None):
     """
-    Record a file and optionally associate it with a stage.
+    Record a file and optionally associate it with a stage.  Use this instead of
+    :func:`hash_and_record_file` when the checksum was computed while reading the file.
+    """
+    record_files(cur, [(file, hash)], stage)
+
+
+def record_files(cur, files, stage=None):
+    """
+    Record several files and optionally associate them with a stage, in one statement
+    per table.
+
+    Args:
+        cur(psycopg2.connection or psycopg2.cursor): the database connection to use.
+        files: an iterable of ``(file, hash)`` pairs.
+        stage(string or None): the stage to associate the files with.
     """
     if hasattr(cur, 'cursor'):
         # this is a connection
         with cur, cur.cursor() as c:
-            return record_file(c, stage)
-    _log.info('recording checksum %s for file %s', hash, file)
-    cur.execute("""
+            return record_files(c, files, stage)
+    # a file can only be upserted once per statement
+    files = list(dict(files).items())
+    if not files:
+        return
+    for file, hash in files:
+        _log.info('recording checksum %s for file %s', hash, file)
+    execute_values(cur, """
         INSERT INTO source_file (filename, checksum)
-        VALUES (%(file)s, %(hash)s)
+        VALUES %s
         ON CONFLICT (filename)
-        DO UPDATE SET checksum = %(hash)s, reg_time = NOW()
-        """, {'file': file, 'hash': hash})
+        DO UPDATE SET checksum = EXCLUDED.checksum, reg_time = NOW()
+        """, files, page_size=1000)
     if stage is not None:
-        cur.execute("INSERT INTO stage_file (stage_name, filename) VALUES (%s, %s)", [stage, file])
+        record_stage_files(cur, stage, [file for file, hash in files])
+
+
+def record_stage_files(cur, stage, files):
+    """
+    Associate several already-recorded files with a stage.
+    """
+    if hasattr(cur, 'cursor'):
+        # this is a connection
+        with cur, cur.cursor() as c:
+            return record_stage_files(c, stage, files)
+    execute_values(cur, "INSERT INTO stage_file (stage_name, filename) VALUES %s",
+                   [(stage, file) for file in files], page_size=1000)
 
 
 def end_stage(cur, stage, key=None):
@@ -0,0 +1,57 @@
+"""
+Run the commands of several independent DVC stages at the same time.
+
+DVC runs one stage at a time, but stages that do not depend on each other (such as the
+LOC book and name imports) can run concurrently against the database.  After this
+script finishes, run ``./dvc.sh commit`` on the stages to record their outputs.
+
+Usage:
+    run-stages.py [options] STAGE...
+
+Options:
+    -j N, --jobs N
+        Run up to N stages at once [default: 4].
+    STAGE
+        The .dvc file of a stage to run.
+"""
+
+import sys
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import subprocess as sp
+
+import yaml
+from docopt import docopt
+
+from bookdata import script_log
+
+_log = script_log(__name__)
+opts = docopt(__doc__)
+
+
+def run_stage(path):
+    with open(path, 'r') as sf:
+        stage = yaml.load(sf, Loader=yaml.CSafeLoader)
+    wdir = path.parent / stage.get('wdir', '.')
+    cmd = stage['cmd']
+    _log.info('running %s: %s', path, cmd)
+    sp.run(cmd, shell=True, cwd=wdir, check=True)
+    _log.info('finished %s', path)
+
+
+# don't start the same stage twice
+stages = list(dict.fromkeys(Path(s) for s in opts['STAGE']))
+jobs = int(opts['--jobs'])
+
+failed = []
+with ThreadPoolExecutor(jobs) as pool:
+    results = [(s, pool.submit(run_stage, s)) for s in stages]
+    for s, res in results:
+        try:
+            res.result()
+        except sp.CalledProcessError as e:
+            _log.error('stage %s failed with code %d', s, e.returncode)
+            failed.append(s)
+
+if failed:
+    sys.exit(1)
@@ -20,6 +20,7 @@ import sys
 import re
 import time
 import hashlib
+from io import BytesIO
 from pathlib import Path
 from datetime import timedelta
 from typing import NamedTuple, List
@@ -50,7 +51,9 @@ if not stage:
     stage = script_file.stem
 
 _log.info('reading %s', script_file)
-script = db.SqlScript(script_file)
+# read the script once, to both parse and checksum it
+script_data = script_file.read_bytes()
+script = db.SqlScript(BytesIO(script_data))
 _log.info('%s has %d chunks', script_file, len(script.chunks))
 if opts.get('--dry-run'):
     script.describe()
@@ -63,7 +66,8 @@ else:
                 dhs = tracking.record_dep(cur, stage, dep)
                 # hash the dependency hashes
                 for d, h in dhs: key.update(h.encode('utf-8'))
-            h = tracking.hash_and_record_file(cur, script_file, stage)
+            h = tracking.hash_data(script_data)
+            tracking.record_file(cur, script_file.as_posix(), h, stage)
             # hash the source file
             key.update(h.encode('utf-8'))
         script.execute(dbc, transcript=txf)
@@ -3,6 +3,7 @@ use std::io::{self, BufReader, BufWriter};
 use std::fs::File;
 use std::path::PathBuf;
 use std::str;
+use std::thread;
 
 use log::*;
 
@@ -12,6 +13,7 @@ use structopt::StructOpt;
 use quick_xml::Reader;
 use quick_xml::events::Event;
 use flate2::bufread::MultiGzDecoder;
+use os_pipe::{pipe, PipeReader};
 use indicatif::{ProgressBar, ProgressStyle};
 use anyhow::{Result, anyhow};
 
@@ -77,6 +79,18 @@ fn process_delim_file<R: BufRead, W: Write>(r: &mut R, w: &mut W, init: usize) -
   Ok(rec_count)
 }
 
+/// Decompress a GZ stream on a background thread, so decompression overlaps with
+/// parsing.  The returned reader yields the decompressed data; the thread's result
+/// reports any decompression error once the reader has been consumed and dropped.
+fn decompress_background<R: BufRead + Send + 'static>(src: R) -> Result<(PipeReader, thread::JoinHandle<io::Result<u64>>)> {
+  let (read, mut write) = pipe()?;
+  let handle = thread::spawn(move || {
+    let mut gzf = MultiGzDecoder::new(src);
+    io::copy(&mut gzf, &mut write)
+  });
+  Ok((read, handle))
+}
+
 /// Process a file containing a MARC collection.
 fn process_marc_file<R: BufRead, W: Write>(r: &mut R, w: &mut W, init: usize) -> Result<usize> {
   let mut parse = Reader::from_reader(r);
@@ -229,7 +243,7 @@ impl Command for ParseMarc {
       let mut in_sf = stage.source_file(inf);
       let pbr = pb.wrap_read(fs);
       let pbr = BufReader::new(pbr);
-      let gzf = MultiGzDecoder::new(pbr);
+      let (gzf, gz_thread) = decompress_background(pbr)?;
       let gzf = in_sf.wrap_read(gzf);
       let mut bfs = BufReader::new(gzf);
       let nrecs = if self.linemode {
@@ -238,14 +252,24 @@ impl Command for ParseMarc {
         process_marc_file(&mut bfs, &mut out, count)
       };
       drop(bfs);
+      let unpacked = gz_thread.join().map_err(|_| anyhow!("decompression thread panicked"))?;
       match nrecs {
         Ok(n) => {
+          unpacked?;
           info!("processed {} records from {:?}", n, inf);
           let hash = in_sf.record()?;
           writeln!(&mut stage, "READ {:?} {} {}", inf, n, hash)?;
           count += n;
         },
         Err(e) => {
+          // a broken decompression stream is the root cause of any parse error,
+          // unless it only failed because the parser stopped reading
+          if let Err(ge) = unpacked {
+            if ge.kind() != io::ErrorKind::BrokenPipe {
+              error!("error decompressing {:?}: {}", inf, ge);
+              return Err(ge.into())
+            }
+          }
           error!("error in {:?}: {}", inf, e);
           return Err(e)
         }